@@ -8,6 +8,11 @@ import requests
 import numpy as np
 import pandas_ta as ta
 import time
+from candles import CandleBuffer
+from decoding import load_scrip_master
+from alerts import SignalDeduplicator
+from risk import RiskManager
+from replay import RecordingSmartConnect, open_recorder
 
 # Initialize FastAPI app
 app = FastAPI()
@@ -38,11 +43,31 @@ TOTP_TOKEN = ''
 # External endpoint to POST signal data
 EXTERNAL_ENDPOINT = "http://example.com/signals"
 
+# Record broker responses for replay.py, e.g. "session.jsonl.gz" (None = off)
+RECORD_FILE = None
+
+# Signal deduplication: state survives restarts in SIGNAL_STATE_FILE
+STRATEGY = "KAMA_CHOP"
+SIGNAL_STATE_FILE = "signal_state.json"
+SIGNAL_COOLDOWN = 900  # seconds of bar time before the same side may fire again
+
+# Risk and position sizing
+CAPITAL = 1_000_000
+RISK_PER_TRADE = 0.01  # fraction of capital lost if the stop is hit
+STOP_ATR = 1.5         # stop beyond the previous bar's low/high, in ATRs
+TARGET_ATR = 2.5       # target from the close, in ATRs
+# Open positions to check exposure against:
+# {"symbol": "TCS", "signal": "BUY", "quantity": 10, "price": 3500.0}
+OPEN_POSITIONS = []
+
 # Initialize SmartConnect
 from SmartApi import SmartConnect
 import pyotp
 
 smart_api = SmartConnect(api_key=API_KEY)
+recorder = open_recorder(RECORD_FILE)
+if recorder:
+    smart_api = RecordingSmartConnect(smart_api, recorder)
 totp = pyotp.TOTP(TOTP_TOKEN).now()
 
 try:
@@ -57,15 +82,12 @@ except Exception as e:
 # Token Map Fetching
 def fetch_token_map():
     logging.info("Fetching token map...")
-    url = 'https://margincalculator.angelbroking.com/OpenAPI_File/files/OpenAPIScripMaster.json'
     try:
-        response = requests.get(url, timeout=10)
-        if response.status_code == 200:
-            token_df = pd.DataFrame(response.json())
-            token_df['expiry'] = token_df['expiry'].str.strip()
-            token_df = token_df.astype({'strike': float})
-            logging.info("Token map fetched successfully.")
-            return token_df
+        token_df = load_scrip_master(timeout=10)
+        if recorder:
+            recorder.record("scrip_master", "", token_df.to_dict('list'))
+        logging.info("Token map fetched successfully.")
+        return token_df
     except Exception as e:
         logging.error(f"Error fetching token map: {e}")
     return pd.DataFrame()
@@ -74,6 +96,34 @@ token_df = fetch_token_map()
 
 # Symbol List
 SYMBOL_LIST = ["ACC", "APOLLOTYRE", "ASHOKLEY", "ASIANPAINT", "BAJAJHLDNG", "HDFCBANK", "TCS", "RELIANCE"]
+SECTOR_MAP = {
+    "ACC": "CEMENT",
+    "APOLLOTYRE": "AUTO",
+    "ASHOKLEY": "AUTO",
+    "ASIANPAINT": "CONSUMER",
+    "BAJAJHLDNG": "FINANCE",
+    "HDFCBANK": "FINANCE",
+    "TCS": "IT",
+    "RELIANCE": "ENERGY",
+}
+
+# Columnar candle storage reused across symbols
+candle_buffer = CandleBuffer()
+
+# Sizes, exposure-checks and ranks each batch of signals
+risk_manager = RiskManager(
+    CAPITAL,
+    risk_per_trade=RISK_PER_TRADE,
+    stop_atr=STOP_ATR,
+    target_atr=TARGET_ATR,
+    sectors=SECTOR_MAP,
+)
+
+# Remembers which signals were already sent downstream
+signal_filter = SignalDeduplicator(cooldown=SIGNAL_COOLDOWN, path=SIGNAL_STATE_FILE)
+
+# Latest bar time fetched per symbol, so the filter counts quiet bars, not scans
+latest_bars = {}
 
 # Fetch Historical Data
 def get_historical_data(symbol_token, interval='FIVE_MINUTE', days=10):
@@ -99,20 +149,30 @@ def get_historical_data(symbol_token, interval='FIVE_MINUTE', days=10):
     return []
 
 # Custom KAMA Calculation
-def calculate_kama(df, length=14, fast_length=2, slow_length=30):
-    close = df['close']
-    kama = [close.iloc[0]]  # Initialize with first close
-    momentum = close.diff(length).abs()
-    volatility = close.diff().abs().rolling(window=length).sum()
-    er = np.where(volatility != 0, momentum / volatility, 0)
+def calculate_kama(candles, length=14, fast_length=2, slow_length=30, out=None):
+    close = np.asarray(candles['close'], dtype=np.float64)
+    n = len(close)
+    kama = out if out is not None else np.empty(n)
+    if n == 0:
+        return kama
+    momentum = np.full(n, np.nan)
+    volatility = np.full(n, np.nan)
+    if n > length:
+        momentum[length:] = np.abs(close[length:] - close[:-length])
+        volatility[length:] = np.convolve(np.abs(np.diff(close)), np.ones(length), 'valid')
+    with np.errstate(divide='ignore', invalid='ignore'):
+        er = np.where(volatility != 0, momentum / volatility, 0)
     fast_alpha = 2 / (fast_length + 1)
     slow_alpha = 2 / (slow_length + 1)
     alpha = (er * (fast_alpha - slow_alpha) + slow_alpha) ** 2
-    for i in range(1, len(close)):
-        current_alpha = alpha[i] if not np.isnan(alpha[i]) else slow_alpha
-        new_kama = current_alpha * close.iloc[i] + (1 - current_alpha) * kama[-1]
-        kama.append(new_kama)
-    return pd.Series(kama, index=close.index)
+    alpha = np.where(np.isnan(alpha), slow_alpha, alpha).tolist()
+    values = close.tolist()
+    current = values[0]  # Initialize with first close
+    kama[0] = current
+    for i in range(1, n):
+        current = alpha[i] * values[i] + (1 - alpha[i]) * current
+        kama[i] = current
+    return kama
 
 # Generate Signals
 
@@ -131,69 +191,55 @@ def generate_signals(symbol):
         if not candle_data:
             logging.warning(f"No data returned for symbol {symbol}.")
             return None
+        latest_bars[symbol] = candle_data[-1][0]
 
         # Process historical data
-        df = pd.DataFrame(candle_data, columns=['timestamp', 'open', 'high', 'low', 'close', 'volume'])
-        df['timestamp'] = pd.to_datetime(df['timestamp'])
-        df.set_index('timestamp', inplace=True)
+        candles = candle_buffer.load(candle_data)
+        risk_manager.record(symbol, candles.close)
 
         # Calculate Indicators
-        df['KAMA_short'] = calculate_kama(df, length=14)
-        df['KAMA_long'] = calculate_kama(df, length=250)
-        df['CHOP'] = ta.chop(df['high'], df['low'], df['close'], length=14)
-        df['ATR'] = ta.atr(df['high'], df['low'], df['close'], length=14)
+        calculate_kama(candles, length=14, out=candles.column('KAMA_short'))
+        calculate_kama(candles, length=250, out=candles.column('KAMA_long'))
+        candles['CHOP'] = ta.chop(candles.series('high'), candles.series('low'), candles.series('close'), length=14)
+        candles['ATR'] = ta.atr(candles.series('high'), candles.series('low'), candles.series('close'), length=14)
 
-        # Determine KAMA transitions
-        df['KAMA_short_color'] = df['KAMA_short'].diff().apply(lambda x: 'green' if x > 0 else 'red')
-        df['KAMA_long_color'] = df['KAMA_long'].diff().apply(lambda x: 'green' if x > 0 else 'red')
+        # Determine KAMA transitions (True = green, False = red)
+        short_green = np.diff(candles['KAMA_short'], prepend=np.nan) > 0
+        long_green = np.diff(candles['KAMA_long'], prepend=np.nan) > 0
 
-        latest = df.iloc[-1]
-        previous = df.iloc[-2]
+        latest, previous = -1, -2
+        close = candles.close[latest]
+        chop = candles['CHOP'][latest]
+        atr = candles['ATR'][latest]
 
         signal = None
-        stop_loss = None
-        target = None
 
         # BUY Signal Logic
-        if (previous['KAMA_short_color'] == 'red' and latest['KAMA_short_color'] == 'green' and
-            previous['KAMA_long_color'] == 'red' and latest['KAMA_long_color'] == 'green' and
-            latest['CHOP'] < 50):
+        if (not short_green[previous] and short_green[latest] and
+            not long_green[previous] and long_green[latest] and
+            chop < 50):
             signal = "BUY"
-            stop_loss = round(previous['low'] - (latest['ATR'] * 1.5), 2)
-            target = round(latest['close'] + (latest['ATR'] * 2.5), 2)
 
         # SELL Signal Logic
-        elif (previous['KAMA_short_color'] == 'green' and latest['KAMA_short_color'] == 'red' and
-              previous['KAMA_long_color'] == 'green' and latest['KAMA_long_color'] == 'red' and
-              latest['CHOP'] < 50):
+        elif (short_green[previous] and not short_green[latest] and
+              long_green[previous] and not long_green[latest] and
+              chop < 50):
             signal = "SELL"
-            stop_loss = round(previous['high'] + (latest['ATR'] * 1.5), 2)
-            target = round(latest['close'] - (latest['ATR'] * 2.5), 2)
 
         # Return Signal Result
         if signal:
             result = {
                 "symbol": symbol,
                 "signal": signal,
-                "Close": latest['close'],
-                "KAMA_short": latest['KAMA_short'],
-                "KAMA_long": latest['KAMA_long'],
-                "CHOP": latest['CHOP'],
-                "ATR": latest['ATR'],
-                "Stop_Loss": stop_loss,
-                "Target": target
+                "Close": close,
+                "KAMA_short": candles['KAMA_short'][latest],
+                "KAMA_long": candles['KAMA_long'][latest],
+                "CHOP": chop,
+                "ATR": atr,
+                "Prev_Low": candles.low[previous],
+                "Prev_High": candles.high[previous],
+                "Time": candle_data[-1][0]
             }
-
-            # Post to external endpoint
-            try:
-                response = requests.post(EXTERNAL_ENDPOINT, json=result, timeout=5)
-                if response.status_code == 200:
-                    logging.info(f"Signal for {symbol} sent successfully: {result}")
-                else:
-                    logging.error(f"Failed to post signal for {symbol}: {response.text}")
-            except Exception as e:
-                logging.error(f"Error posting signal for {symbol}: {e}")
-
             return result
         else:
             logging.info(f"No signal generated for {symbol}.")
@@ -205,22 +251,53 @@ def generate_signals(symbol):
 
 
 
-@app.get("/signals")
-async def fetch_signals():
+def publish_signal(result):
+    """Post a signal to the external endpoint."""
+    symbol = result['symbol']
+    try:
+        response = requests.post(EXTERNAL_ENDPOINT, json=result, timeout=5)
+        if response.status_code == 200:
+            logging.info(f"Signal for {symbol} sent successfully: {result}")
+        else:
+            logging.error(f"Failed to post signal for {symbol}: {response.text}")
+    except Exception as e:
+        logging.error(f"Error posting signal for {symbol}: {e}")
+
+
+def scan_symbols(symbols):
+    """Run generate_signals over a list of symbols and collect the hits.
+
+    The hits are sized and ranked as one batch by the risk manager. Every
+    hit is returned, but only signals the risk manager accepted are passed
+    to the deduplicator, and only the new ones are posted to the external
+    endpoint.
+    """
     results = []
-    for symbol in SYMBOL_LIST:
+    for symbol in symbols:
         result = generate_signals(symbol)
         if result:
             results.append(result)
+    results = risk_manager.plan(results, OPEN_POSITIONS)
+    accepted = [result for result in results if result['Risk_Status'] == 'OK']
+    bars = {symbol: latest_bars[symbol] for symbol in symbols if symbol in latest_bars}
+    for result in signal_filter.filter(accepted, bars, STRATEGY):
+        publish_signal(result)
     return results
 
-@app.on_event("startup")
+
+@app.get("/signals")
+async def fetch_signals():
+    return scan_symbols(SYMBOL_LIST)
+
 async def scheduled_scanner():
     while True:
-        for symbol in SYMBOL_LIST:
-            generate_signals(symbol)
+        scan_symbols(SYMBOL_LIST)
         await asyncio.sleep(300)
 
+@app.on_event("startup")
+async def startup_event():
+    asyncio.create_task(scheduled_scanner())
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
@@ -0,0 +1,111 @@
+import json
+import logging
+import os
+from decoding import parse_timestamps
+
+SIDES = {"BUY": 1, "SELL": -1}
+NANOS = 1_000_000_000
+
+
+class SignalState:
+    """Last emitted signal for one (symbol, strategy)."""
+
+    __slots__ = ('side', 'bar', 'quiet', 'seen')
+
+    def __init__(self, side, bar, quiet=0, seen=None):
+        self.side = side    # +1 BUY, -1 SELL
+        self.bar = bar      # bar open time, epoch seconds
+        self.quiet = quiet  # bars without a signal since it last fired
+        self.seen = bar if seen is None else seen  # latest bar counted
+
+
+class SignalDeduplicator:
+    """Let only genuinely new signals through to the webhook and clients.
+
+    Signals are keyed by (symbol, strategy, bar time). A signal is dropped
+    when it repeats the bar already emitted, or when it repeats the last side
+    before the symbol has been quiet for ``rearm_after`` bars (hysteresis)
+    and ``cooldown`` seconds of bar time have passed. A reversal to the
+    opposite side is always new. Cooldowns run on bar time rather than wall
+    clock so replays behave like live runs, and quiet bars are counted once
+    however often the same bar is scanned.
+    """
+
+    def __init__(self, cooldown=900, rearm_after=2, path=None):
+        self.cooldown = cooldown
+        self.rearm_after = rearm_after
+        self.path = None
+        self._states = {}
+        self._dirty = False
+        if path:
+            self.load(path)
+
+    def admit(self, symbol, strategy, side, bar):
+        """Record a signal on bar ``bar`` (epoch seconds); True if it is new."""
+        key = (symbol, strategy)
+        side = SIDES[side]
+        state = self._states.get(key)
+        if state is not None:
+            if bar <= state.bar:
+                return False
+            if side == state.side and (state.quiet < self.rearm_after or bar - state.bar < self.cooldown):
+                state.quiet = 0
+                state.seen = bar
+                self._dirty = True
+                return False
+        self._states[key] = SignalState(side, bar)
+        self._dirty = True
+        return True
+
+    def quiet(self, symbol, strategy, bar):
+        """Note that ``symbol`` produced no signal on bar ``bar`` (epoch seconds)."""
+        state = self._states.get((symbol, strategy))
+        if state is None or bar <= state.seen:
+            return
+        state.seen = bar
+        if state.quiet < self.rearm_after:
+            state.quiet += 1
+        self._dirty = True
+
+    def filter(self, results, bars, strategy):
+        """Return the new results from one scan.
+
+        ``results`` are signal dicts with 'symbol', 'signal' and the bar
+        time in 'Time'. ``bars`` maps every scanned symbol to its latest bar
+        time; symbols in it without a result count as quiet on that bar.
+        """
+        times = parse_timestamps([result['Time'] for result in results]) // NANOS
+        fresh = [
+            result for result, bar in zip(results, times.tolist())
+            if self.admit(result['symbol'], strategy, result['signal'], bar)
+        ]
+        signalled = {result['symbol'] for result in results}
+        quiet = [symbol for symbol in bars if symbol not in signalled]
+        times = parse_timestamps([bars[symbol] for symbol in quiet]) // NANOS
+        for symbol, bar in zip(quiet, times.tolist()):
+            self.quiet(symbol, strategy, bar)
+        self.save()
+        return fresh
+
+    def load(self, path):
+        self.path = path
+        self._states = {}
+        if not os.path.exists(path):
+            return
+        try:
+            with open(path) as f:
+                for symbol, strategy, *state in json.load(f):
+                    self._states[(symbol, strategy)] = SignalState(*state)
+        except (OSError, ValueError) as e:
+            logging.error(f"Could not load signal state from {path}: {e}")
+
+    def save(self):
+        if not self.path or not self._dirty:
+            return
+        rows = [[symbol, strategy, s.side, s.bar, s.quiet, s.seen]
+                for (symbol, strategy), s in self._states.items()]
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(rows, f, separators=(',', ':'))
+        os.replace(tmp_path, self.path)
+        self._dirty = False
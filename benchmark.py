@@ -0,0 +1,288 @@
+import argparse
+import gc
+import importlib.util
+import json
+import logging
+import os
+import platform
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+import numpy as np
+import pandas as pd
+
+import fakebroker
+from alerts import SignalDeduplicator
+from candles import CandleBuffer, Candles
+
+RESULTS_DIR = "bench_results"
+DEFAULT_SIZES = [10, 100, 1000, 5000]
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+class ScaledSleep:
+    """Replacement for a scanner module's ``time`` with a scaled ``sleep``.
+
+    The scanners sleep a full second per request for rate limiting, which
+    would make a 5,000 symbol run take well over an hour.
+    """
+
+    def __init__(self, scale):
+        self.scale = scale
+
+    def sleep(self, seconds):
+        if self.scale:
+            time.sleep(seconds * self.scale)
+
+    def __getattr__(self, name):
+        return getattr(time, name)
+
+
+# Scanner Loading
+def load_scanners(symbols, sleep_scale):
+    """Import the scanner scripts against the fake broker."""
+    fakebroker.install(symbols)
+    scanners = {}
+    sources = {"Ai_APi": "Ai_APi.py", "kama": "kama.py", "main_copy": "main (copy).py"}
+    for name, filename in sources.items():
+        try:
+            spec = importlib.util.spec_from_file_location(name, os.path.join(HERE, filename))
+            module = importlib.util.module_from_spec(spec)
+            sys.modules[name] = module
+            spec.loader.exec_module(module)
+        except Exception as e:
+            print(f"skipping {filename}: {e}")
+            sys.modules.pop(name, None)
+            continue
+        module.time = ScaledSleep(sleep_scale)
+        if hasattr(module, "save_data"):
+            module.save_data = False
+        if hasattr(module, "signal_filter"):
+            # In-memory dedup state; the live signal_state.json is left alone
+            module.signal_filter = SignalDeduplicator(cooldown=module.SIGNAL_COOLDOWN)
+        scanners[name] = module
+    return scanners
+
+
+def set_universe(scanners, symbols):
+    token_df = pd.DataFrame(fakebroker.scrip_master(symbols))
+    token_df = token_df.astype({'strike': float})
+    for module in scanners.values():
+        module.token_df = token_df
+        module.SYMBOL_LIST = list(symbols)
+
+
+# Timing
+def timed(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def summarize(samples, bars=None):
+    arr = np.array(samples)
+    summary = {
+        "runs": len(samples),
+        "mean_s": float(arr.mean()),
+        "p50_s": float(np.percentile(arr, 50)),
+        "p99_s": float(np.percentile(arr, 99)),
+    }
+    if bars:
+        summary["bars_per_sec"] = bars / summary["p50_s"]
+    return summary
+
+
+def symbol_latencies(module, fn):
+    """Run ``fn`` and return how long each generate_signals call inside it took."""
+    samples = []
+    generate_signals = module.generate_signals
+
+    def timed_generate(symbol):
+        start = time.perf_counter()
+        try:
+            return generate_signals(symbol)
+        finally:
+            samples.append(time.perf_counter() - start)
+
+    module.generate_signals = timed_generate
+    try:
+        fn()
+    finally:
+        module.generate_signals = generate_signals
+    return samples
+
+
+def peak_memory(fn):
+    gc.collect()
+    tracemalloc.start()
+    try:
+        fn()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def bench_functions(scanners, rows, repeat):
+    """Time the per-symbol stages on one synthetic series."""
+    results = {}
+    bars = len(rows)
+    buffer = CandleBuffer()
+    candles = Candles.from_rows(rows)
+    symbol = scanners[next(iter(scanners))].SYMBOL_LIST[0]
+
+    results["candles.load"] = summarize(timed(lambda: buffer.load(rows), repeat), bars)
+
+    for name, module in scanners.items():
+        if hasattr(module, "calculate_kama"):
+            results[f"{name}.calculate_kama"] = summarize(
+                timed(lambda: module.calculate_kama(candles, length=14), repeat), bars)
+
+    if "kama" in scanners:
+        kama = scanners["kama"]
+        results["kama.calculate_indicators"] = summarize(
+            timed(lambda: kama.calculate_indicators(buffer.load(rows)), repeat), bars)
+        results["kama.generate_signals"] = summarize(
+            timed(lambda: kama.generate_signals(symbol), repeat), bars)
+
+    if "Ai_APi" in scanners:
+        ai_api = scanners["Ai_APi"]
+        results["Ai_APi.generate_signals"] = summarize(
+            timed(lambda: ai_api.generate_signals(symbol), repeat), bars)
+
+    if "main_copy" in scanners:
+        main_copy = scanners["main_copy"]
+        indicators = main_copy.calculate_indicators(rows, symbol)
+        results["main_copy.calculate_indicators"] = summarize(
+            timed(lambda: main_copy.calculate_indicators(rows, symbol), repeat), bars)
+        results["main_copy.generate_signal"] = summarize(
+            timed(lambda: main_copy.generate_signal(indicators, symbol), repeat), bars)
+
+    return results
+
+
+def bench_scans(module, sizes, repeat, measure_memory, bars_per_symbol):
+    """Full scans of ``module`` over synthetic universes of each size.
+
+    Scan times are summarised over ``repeat`` runs; the tail latency comes
+    from the per-symbol times inside those scans, which have enough samples
+    for a meaningful p99.
+    """
+    results = {}
+    broker = module.smart_api
+    for size in sizes:
+        symbols = fakebroker.synthetic_universe(size)
+        set_universe({"scanner": module}, symbols)
+        module.scan_symbols(symbols)  # untimed pass so the fake's candle generation is cached
+        calls_before = broker.calls
+        rejected_before = broker.rejected
+        samples = []
+        per_symbol = symbol_latencies(
+            module, lambda: samples.extend(timed(lambda: module.scan_symbols(symbols), repeat)))
+        summary = summarize(samples, size * bars_per_symbol)
+        summary["symbols"] = size
+        summary["symbols_per_sec"] = size / summary["p50_s"]
+        summary["symbol_p50_s"] = float(np.percentile(per_symbol, 50))
+        summary["symbol_p99_s"] = float(np.percentile(per_symbol, 99))
+        summary["broker_calls"] = broker.calls - calls_before
+        summary["rejected_calls"] = broker.rejected - rejected_before
+        if measure_memory:
+            summary["peak_memory_bytes"] = peak_memory(lambda: module.scan_symbols(symbols))
+        results[str(size)] = summary
+        print(f"scan {size:>5} symbols: p50 {summary['p50_s']:.3f}s  "
+              f"per symbol p50 {summary['symbol_p50_s'] * 1000:.2f} ms  p99 {summary['symbol_p99_s'] * 1000:.2f} ms")
+    return results
+
+
+# Persistence and Comparison
+def save_results(report, directory=RESULTS_DIR):
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, datetime.now().strftime("%Y%m%d-%H%M%S") + ".json")
+    with open(path, "w") as f:
+        json.dump(report, f, indent=2)
+    return path
+
+
+def latest_result(directory=RESULTS_DIR, exclude=None):
+    if not os.path.isdir(directory):
+        return None
+    files = sorted(f for f in os.listdir(directory) if f.endswith(".json"))
+    files = [os.path.join(directory, f) for f in files]
+    files = [f for f in files if f != exclude]
+    return files[-1] if files else None
+
+
+def compare(report, baseline_path):
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    print(f"\nchange vs {baseline_path} (p50, negative is faster)")
+    for section in ("functions", "scans"):
+        for name, current in report.get(section, {}).items():
+            previous = baseline.get(section, {}).get(name)
+            if not previous:
+                continue
+            delta = (current["p50_s"] - previous["p50_s"]) / previous["p50_s"] * 100
+            print(f"  {section}/{name}: {previous['p50_s']:.4f}s -> {current['p50_s']:.4f}s ({delta:+.1f}%)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the scan pipeline against a fake broker")
+    parser.add_argument("--sizes", default=",".join(map(str, DEFAULT_SIZES)),
+                        help="comma separated universe sizes for full scans")
+    parser.add_argument("--repeat", type=int, default=5, help="runs per function benchmark")
+    parser.add_argument("--scan-repeat", type=int, default=5, help="runs per full scan")
+    parser.add_argument("--days", type=int, default=10, help="history requested per symbol")
+    parser.add_argument("--latency", type=float, default=0.0, help="fake getCandleData latency (s)")
+    parser.add_argument("--rate-limit", type=int, default=None, help="fake broker requests/sec")
+    parser.add_argument("--sleep-scale", type=float, default=0.0,
+                        help="fraction of the scanners' own rate-limit sleeps to honour")
+    parser.add_argument("--scanner", default="Ai_APi", help="module used for full scans; must define scan_symbols (only Ai_APi does)")
+    parser.add_argument("--no-memory", action="store_true", help="skip the tracemalloc pass")
+    parser.add_argument("--compare", help="results file to compare with (default: latest)")
+    args = parser.parse_args()
+
+    sizes = [int(s) for s in args.sizes.split(",") if s]
+    fakebroker.FakeSmartConnect.LATENCY = args.latency
+    fakebroker.FakeSmartConnect.RATE_LIMIT = args.rate_limit
+    logging.disable(logging.CRITICAL)
+
+    universe = fakebroker.synthetic_universe(max(sizes + [1]))
+    scanners = load_scanners(universe[:1], args.sleep_scale)
+    if not scanners:
+        sys.exit("no scanner module could be imported")
+    if args.scanner in scanners and not hasattr(scanners[args.scanner], "scan_symbols"):
+        sys.exit(f"{args.scanner} has no scan_symbols; full scans need a module that defines it, e.g. Ai_APi")
+    if args.scanner not in scanners:
+        print(f"skipping full scans: {args.scanner} could not be imported")
+    set_universe(scanners, universe[:1])
+
+    to_date = datetime.now()
+    stamps = fakebroker.session_timestamps(to_date, args.days)
+    rows = fakebroker.synthetic_candles(0, stamps)
+
+    report = {
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+        "numpy": np.__version__,
+        "args": vars(args),
+        "bars_per_symbol": len(rows),
+        "functions": bench_functions(scanners, rows, args.repeat),
+        "scans": {},
+    }
+    for name, summary in report["functions"].items():
+        print(f"{name:<32} p50 {summary['p50_s'] * 1000:8.2f} ms  {summary['bars_per_sec']:12,.0f} bars/s")
+
+    if args.scanner in scanners:
+        report["scans"] = bench_scans(scanners[args.scanner], sizes, args.scan_repeat,
+                                       not args.no_memory, len(rows))
+
+    path = save_results(report)
+    print(f"\nresults saved to {path}")
+    baseline = args.compare or latest_result(exclude=path)
+    if baseline:
+        compare(report, baseline)
@@ -0,0 +1,117 @@
+import numpy as np
+import pandas as pd
+from decoding import parse_timestamps
+
+COLUMNS = ['timestamp', 'open', 'high', 'low', 'close', 'volume']
+PRICE_COLUMNS = ['open', 'high', 'low', 'close']
+TIMEZONE = "Asia/Kolkata"
+
+
+class CandleBuffer:
+    """Reusable backing storage for Candles.
+
+    Arrays grow to the largest series seen and are then reused, so a scan
+    over thousands of symbols allocates its columns once instead of once per
+    symbol. Every Candles handed out by a buffer shares its memory: a new
+    call to ``load`` overwrites the previous series.
+    """
+
+    def __init__(self, capacity=1024, price_dtype=np.float64):
+        self.price_dtype = np.dtype(price_dtype)
+        self.capacity = 0
+        self._columns = {}
+        self._reserve(capacity)
+
+    def _reserve(self, capacity):
+        if capacity <= self.capacity:
+            return
+        self.capacity = max(capacity, 2 * self.capacity)
+        self._columns = {name: np.empty(self.capacity, dtype=array.dtype)
+                         for name, array in self._columns.items()}
+        self._columns.setdefault('timestamp', np.empty(self.capacity, dtype=np.int64))
+        self._columns.setdefault('volume', np.empty(self.capacity, dtype=np.int64))
+        for name in PRICE_COLUMNS:
+            self._columns.setdefault(name, np.empty(self.capacity, dtype=self.price_dtype))
+
+    def array(self, name, length, dtype=np.float64):
+        """Return a length-``length`` slice of the pooled array ``name``."""
+        self._reserve(length)
+        array = self._columns.get(name)
+        if array is None or array.dtype != np.dtype(dtype):
+            array = self._columns[name] = np.empty(self.capacity, dtype=dtype)
+        return array[:length]
+
+    def load(self, candle_data):
+        return Candles.from_rows(candle_data, buffer=self)
+
+
+class Candles:
+    """Columnar OHLCV series.
+
+    ``timestamp`` holds int64 epoch nanoseconds (UTC), prices are float
+    arrays and ``volume`` is int64, each one contiguous. Indicator columns
+    live alongside in ``indicators`` and are read with ``candles[name]``.
+    """
+
+    __slots__ = ('timestamp', 'open', 'high', 'low', 'close', 'volume', 'indicators', '_buffer')
+
+    def __init__(self, timestamp, open, high, low, close, volume, buffer=None):
+        self.timestamp = timestamp
+        self.open = open
+        self.high = high
+        self.low = low
+        self.close = close
+        self.volume = volume
+        self.indicators = {}
+        self._buffer = buffer
+
+    @classmethod
+    def from_rows(cls, candle_data, buffer=None):
+        """Build from getCandleData rows ``[timestamp, open, high, low, close, volume]``."""
+        buffer = buffer or CandleBuffer(len(candle_data))
+        n = len(candle_data)
+        columns = list(zip(*candle_data)) if n else [()] * len(COLUMNS)
+
+        arrays = [parse_timestamps(columns[0], out=buffer.array('timestamp', n, np.int64))]
+        for name, values in zip(COLUMNS[1:], columns[1:]):
+            array = buffer.array(name, n, np.int64 if name == 'volume' else buffer.price_dtype)
+            array[:] = values
+            arrays.append(array)
+        return cls(*arrays, buffer=buffer)
+
+    def __len__(self):
+        return len(self.close)
+
+    def __getitem__(self, name):
+        if name in COLUMNS:
+            return getattr(self, name)
+        return self.indicators[name]
+
+    def __setitem__(self, name, values):
+        self.column(name, np.asarray(values).dtype)[:] = values
+
+    def column(self, name, dtype=np.float64):
+        """Allocate (or reuse) the indicator column ``name``."""
+        if self._buffer is not None:
+            array = self._buffer.array(name, len(self), dtype)
+        else:
+            array = np.empty(len(self), dtype=dtype)
+        self.indicators[name] = array
+        return array
+
+    def series(self, name):
+        """pandas Series over a column without copying, for pandas_ta."""
+        return pd.Series(self[name], copy=False)
+
+    @property
+    def index(self):
+        return pd.DatetimeIndex(self.timestamp.view('datetime64[ns]')).tz_localize('UTC').tz_convert(TIMEZONE)
+
+    def to_frame(self):
+        """DataFrame view of all columns, indexed by timestamp; for export only."""
+        data = {name: getattr(self, name) for name in COLUMNS[1:]}
+        data.update(self.indicators)
+        df = pd.DataFrame(data, copy=False)
+        df.index = self.index
+        df.index.name = 'timestamp'
+        return df
@@ -0,0 +1,352 @@
+import argparse
+import bisect
+import hashlib
+import importlib
+import json
+import logging
+import multiprocessing as mp
+import queue
+import threading
+import time
+from fastapi import FastAPI
+from fastapi.middleware.cors import CORSMiddleware
+
+try:
+    import redis
+except ImportError:  # only needed for multi-host mode
+    redis = None
+
+# Logging setup
+logging.basicConfig(
+    filename="activity.log",
+    level=logging.INFO,
+    format="%(asctime)s - %(levelname)s - %(message)s",
+)
+logging.getLogger("uvicorn").setLevel(logging.WARNING)
+
+# Module providing token_df, SYMBOL_LIST and scan_symbols()
+SCANNER_MODULE = "Ai_APi"
+SCAN_INTERVAL = 300
+VIRTUAL_NODES = 64
+QUEUE_NAME = "scanner:results"
+TOKEN_MAP_RETRY = 30  # seconds between scrip master fetches while a worker has none
+
+
+# Consistent Hashing
+class HashRing:
+    """Map symbol tokens onto worker nodes with a consistent hash ring.
+
+    Each node is placed on the ring ``replicas`` times so that adding or
+    removing a worker only moves roughly 1/N of the universe.
+    """
+
+    def __init__(self, nodes, replicas=VIRTUAL_NODES):
+        self.nodes = list(nodes)
+        self._ring = sorted(
+            (self._hash(f"{node}#{i}"), node)
+            for node in self.nodes
+            for i in range(replicas)
+        )
+        self._keys = [key for key, _ in self._ring]
+
+    @staticmethod
+    def _hash(value):
+        return int.from_bytes(hashlib.md5(str(value).encode()).digest()[:8], "big")
+
+    def node_for(self, token):
+        if not self._ring:
+            raise ValueError("Hash ring has no nodes")
+        idx = bisect.bisect(self._keys, self._hash(token)) % len(self._keys)
+        return self._ring[idx][1]
+
+    def partition(self, items, key=lambda item: item):
+        shards = {node: [] for node in self.nodes}
+        for item in items:
+            shards[self.node_for(key(item))].append(item)
+        return shards
+
+
+# Result Queues
+class LocalQueue:
+    """Process-safe queue for running all workers on one machine."""
+
+    def __init__(self, context=None):
+        context = context or mp.get_context("spawn")
+        self._queue = context.Queue()
+
+    def put(self, message):
+        self._queue.put(message)
+
+    def get(self, timeout=1.0):
+        try:
+            return self._queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+
+class RedisQueue:
+    """Redis list used as a queue between hosts (any Redis-compatible server)."""
+
+    def __init__(self, url, name=QUEUE_NAME):
+        if redis is None:
+            raise RuntimeError("The redis package is required for RedisQueue")
+        self.url = url
+        self.name = name
+        self._client = redis.Redis.from_url(url)
+
+    def __getstate__(self):
+        return {"url": self.url, "name": self.name}
+
+    def __setstate__(self, state):
+        self.__init__(state["url"], state["name"])
+
+    def put(self, message):
+        self._client.rpush(self.name, json.dumps(message, default=float))
+
+    def get(self, timeout=1.0):
+        item = self._client.blpop(self.name, timeout=max(1, int(timeout)))
+        if item is None:
+            return None
+        return json.loads(item[1])
+
+
+# Worker
+def token_for(token_df, symbol):
+    """Return the NSE token for a symbol, or None if the scrip master lacks it."""
+    if token_df.empty:
+        return None
+    token_info = token_df[(token_df['name'] == symbol) & (token_df['exch_seg'] == 'NSE')]
+    if token_info.empty:
+        return None
+    return token_info.iloc[0]['token']
+
+
+def owned_symbols(node_id, ring, token_df, universe):
+    """Symbols of ``universe`` that hash to ``node_id``.
+
+    Symbols missing from the scrip master are hashed by name, which every
+    worker does the same way, and are logged since they cannot be scanned.
+    """
+    owned = []
+    unresolved = []
+    for symbol in universe:
+        token = token_for(token_df, symbol)
+        if token is None:
+            unresolved.append(symbol)
+            token = symbol
+        if ring.node_for(token) == node_id:
+            owned.append(symbol)
+    if unresolved:
+        logging.warning(f"Worker {node_id}: no NSE token for {', '.join(unresolved)}; hashing by name.")
+    return owned
+
+
+def run_worker(node_id, nodes, result_queue, symbols=None, interval=SCAN_INTERVAL,
+               cycles=None, scanner_module=SCANNER_MODULE):
+    """Scan the shard of the universe owned by ``node_id`` and report results.
+
+    Importing the scanner module inside the worker gives every worker its own
+    broker session and its own rate budget. The risk stage runs inside each
+    worker on that shard's signals only. A worker does not start scanning
+    until it has a token map, since without one its shard would not match
+    the other workers' shards.
+    """
+    scanner = importlib.import_module(scanner_module)
+    if hasattr(scanner, "signal_filter"):
+        # One dedup state file per shard so workers do not overwrite each other
+        scanner.signal_filter.load(f"{node_id}.{scanner.SIGNAL_STATE_FILE}")
+    if hasattr(scanner, "risk_manager") and len(nodes) > 1:
+        # Each shard plans its own signals; split the sector budget so the
+        # shards together cannot exceed it
+        scanner.risk_manager.max_sector_pct /= len(nodes)
+        logging.warning(f"Worker {node_id}: risk limits are enforced per shard; sector cap "
+                        f"{scanner.risk_manager.max_sector_pct:.1%} of capital, correlation "
+                        f"only against open positions with history on this shard.")
+    while scanner.token_df.empty:
+        logging.error(f"Worker {node_id} has no token map; retrying in {TOKEN_MAP_RETRY}s.")
+        time.sleep(TOKEN_MAP_RETRY)
+        scanner.token_df = scanner.fetch_token_map()
+    ring = HashRing(nodes)
+    universe = symbols if symbols is not None else scanner.SYMBOL_LIST
+    owned = owned_symbols(node_id, ring, scanner.token_df, universe)
+    logging.info(f"Worker {node_id} owns {len(owned)} of {len(universe)} symbols.")
+
+    cycle = 0
+    while cycles is None or cycle < cycles:
+        started = time.time()
+        try:
+            results = scanner.scan_symbols(owned)
+        except Exception as e:
+            logging.error(f"Worker {node_id} scan failed: {e}")
+            results = []
+        result_queue.put({
+            "node": node_id,
+            "symbols": owned,
+            "results": results,
+            "scanned_at": started,
+            "scan_seconds": time.time() - started,
+        })
+        cycle += 1
+        if cycles is None or cycle < cycles:
+            time.sleep(max(0.0, interval - (time.time() - started)))
+
+
+def start_local_workers(nodes, result_queue, **worker_kwargs):
+    """Spawn one process per node on this machine."""
+    context = mp.get_context("spawn")
+    processes = []
+    for node_id in nodes:
+        process = context.Process(
+            target=run_worker,
+            args=(node_id, nodes, result_queue),
+            kwargs=worker_kwargs,
+            name=f"scanner-{node_id}",
+            daemon=True,
+        )
+        process.start()
+        processes.append(process)
+    return processes
+
+
+# Aggregator
+class Aggregator:
+    """Collect worker batches; each batch replaces that node's previous one.
+
+    A worker is expected to report every ``interval`` seconds, or every scan
+    if its scans take longer. A batch received more than two such periods
+    ago comes from a worker that has stopped reporting; its signals are no
+    longer served and the worker is flagged as stale in ``status``. Ages are
+    measured on the coordinator's clock from when a batch was received.
+    """
+
+    def __init__(self, result_queue, interval=SCAN_INTERVAL):
+        self.result_queue = result_queue
+        self.interval = interval
+        self._batches = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def handle(self, message):
+        message["received_at"] = time.time()
+        with self._lock:
+            self._batches[message["node"]] = message
+        logging.info(f"Received {len(message['results'])} signals from worker {message['node']}.")
+
+    def run(self):
+        while not self._stop.is_set():
+            message = self.result_queue.get(timeout=1.0)
+            if message is not None:
+                self.handle(message)
+
+    def start(self):
+        self._thread = threading.Thread(target=self.run, name="aggregator", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _is_stale(self, batch, now):
+        period = max(self.interval, batch.get("scan_seconds", 0))
+        return now - batch["received_at"] > 2 * period
+
+    def signals(self):
+        now = time.time()
+        with self._lock:
+            batches = sorted(self._batches.items())
+        fresh = []
+        for node, batch in batches:
+            if self._is_stale(batch, now):
+                logging.warning(f"Dropping signals from worker {node}: last batch {now - batch['received_at']:.0f}s ago.")
+                continue
+            fresh.extend(batch["results"])
+        return fresh
+
+    def status(self):
+        now = time.time()
+        with self._lock:
+            return {
+                node: {
+                    "symbols": len(batch["symbols"]),
+                    "scanned_at": batch["scanned_at"],
+                    "received_at": batch["received_at"],
+                    "scan_seconds": batch.get("scan_seconds"),
+                    "stale": self._is_stale(batch, now),
+                }
+                for node, batch in sorted(self._batches.items())
+            }
+
+
+def create_app(aggregator):
+    """Coordinator FastAPI app serving the aggregated signals."""
+    app = FastAPI()
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=["*"],
+        allow_credentials=True,
+        allow_methods=["*"],
+        allow_headers=["*"],
+    )
+
+    @app.on_event("startup")
+    async def start_aggregator():
+        aggregator.start()
+
+    @app.on_event("shutdown")
+    async def stop_aggregator():
+        aggregator.stop()
+
+    @app.get("/signals")
+    async def fetch_signals():
+        return aggregator.signals()
+
+    @app.get("/workers")
+    async def fetch_workers():
+        return aggregator.status()
+
+    return app
+
+
+def node_names(args):
+    if args.nodes:
+        return args.nodes.split(",")
+    return [f"worker-{i}" for i in range(args.workers)]
+
+
+def make_queue(args):
+    if args.redis_url:
+        return RedisQueue(args.redis_url)
+    return LocalQueue()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Sharded scanner: coordinator and workers")
+    parser.add_argument("role", choices=["coordinator", "worker"])
+    parser.add_argument("--workers", type=int, default=2, help="local worker processes to spawn")
+    parser.add_argument("--nodes", help="comma separated node ids (multi-host mode)")
+    parser.add_argument("--node-id", help="this worker's node id")
+    parser.add_argument("--redis-url", help="use a Redis queue instead of a local one")
+    parser.add_argument("--scanner", default=SCANNER_MODULE)
+    parser.add_argument("--interval", type=int, default=SCAN_INTERVAL)
+    parser.add_argument("--port", type=int, default=8000)
+    args = parser.parse_args()
+
+    nodes = node_names(args)
+    result_queue = make_queue(args)
+
+    if args.role == "worker":
+        if not args.redis_url:
+            parser.error("worker role needs --redis-url; local workers are spawned by the coordinator")
+        if args.node_id not in nodes:
+            parser.error("--node-id must be one of --nodes")
+        run_worker(args.node_id, nodes, result_queue,
+                   interval=args.interval, scanner_module=args.scanner)
+    else:
+        if not args.redis_url:
+            start_local_workers(nodes, result_queue,
+                                interval=args.interval, scanner_module=args.scanner)
+        import uvicorn
+        aggregator = Aggregator(result_queue, interval=args.interval)
+        uvicorn.run(create_app(aggregator), host="0.0.0.0", port=args.port)
@@ -0,0 +1,115 @@
+import json
+import numpy as np
+import pandas as pd
+import requests
+
+try:
+    import orjson
+except ImportError:  # falls back to the standard library decoder
+    orjson = None
+
+try:
+    import ijson
+except ImportError:  # scrip master is then decoded in one go
+    ijson = None
+
+SCRIP_MASTER_URL = 'https://margincalculator.angelbroking.com/OpenAPI_File/files/OpenAPIScripMaster.json'
+SCRIP_COLUMNS = ['token', 'symbol', 'name', 'exch_seg']
+
+# "2024-01-01T09:15:00+05:30" as returned by getCandleData
+TIMESTAMP_LENGTH = 25
+TIMESTAMP_SEPARATORS = {4: b'-', 7: b'-', 10: b'T', 13: b':', 16: b':', 22: b':'}
+TIMESTAMP_DIGITS = [0, 1, 2, 3, 5, 6, 8, 9, 11, 12, 14, 15, 17, 18, 20, 21, 23, 24]
+
+
+def decode_json(data):
+    """Decode a JSON document from bytes or str with the fastest parser available."""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def _digits(chars, start, width):
+    value = np.zeros(len(chars), dtype=np.int64)
+    for i in range(start, start + width):
+        value = value * 10 + (chars[:, i] - ord('0'))
+    return value
+
+
+def parse_timestamps(values, out=None):
+    """Parse broker timestamps into int64 epoch nanoseconds (UTC).
+
+    The fixed ``YYYY-MM-DDTHH:MM:SS+HH:MM`` layout is decoded column-wise on
+    the raw bytes. If any value is not in that layout, or has a field out of
+    range, the whole batch goes through ``pd.to_datetime``, which raises on
+    invalid dates.
+    """
+    n = len(values)
+    out = out if out is not None else np.empty(n, dtype=np.int64)
+    if n == 0:
+        return out
+
+    try:
+        raw = np.array(values, dtype=f'S{TIMESTAMP_LENGTH + 1}')
+    except (UnicodeEncodeError, ValueError):
+        raw = np.zeros(n, dtype=f'S{TIMESTAMP_LENGTH + 1}')
+    chars = raw.view(np.uint8).reshape(n, TIMESTAMP_LENGTH + 1)
+    digits = chars[:, TIMESTAMP_DIGITS]
+    fixed = (
+        not chars[:, TIMESTAMP_LENGTH].any()
+        and np.isin(chars[:, 19], (ord('+'), ord('-'))).all()
+        and all((chars[:, pos] == ord(sep)).all() for pos, sep in TIMESTAMP_SEPARATORS.items())
+        and ((digits >= ord('0')) & (digits <= ord('9'))).all()
+    )
+    if fixed:
+        month, day = _digits(chars, 5, 2), _digits(chars, 8, 2)
+        hour, minute, second = _digits(chars, 11, 2), _digits(chars, 14, 2), _digits(chars, 17, 2)
+        offset_hour, offset_minute = _digits(chars, 20, 2), _digits(chars, 23, 2)
+        month_start = ((_digits(chars, 0, 4) - 1970) * 12 + month - 1).astype('datetime64[M]')
+        first_day = month_start.astype('datetime64[D]').astype(np.int64)
+        month_days = (month_start + 1).astype('datetime64[D]').astype(np.int64) - first_day
+        fixed = (
+            ((month >= 1) & (month <= 12) & (day >= 1) & (day <= month_days)).all()
+            and ((hour < 24) & (minute < 60) & (second < 60)).all()
+            and ((offset_hour < 24) & (offset_minute < 60)).all()
+        )
+    if not fixed:
+        out[:] = pd.to_datetime(list(values), utc=True).as_unit('ns').asi8
+        return out
+
+    days = first_day + day - 1
+    seconds = days * 86400 + hour * 3600 + minute * 60 + second
+    offset = offset_hour * 3600 + offset_minute * 60
+    seconds -= np.where(chars[:, 19] == ord('-'), -offset, offset)
+    np.multiply(seconds, 1_000_000_000, out=out)
+    return out
+
+
+def load_scrip_master(url=SCRIP_MASTER_URL, exch_seg='NSE', columns=SCRIP_COLUMNS, timeout=10):
+    """Download the scrip master keeping only ``columns`` of ``exch_seg`` rows.
+
+    With ijson installed the ~30 MB document is parsed as a stream and
+    rejected rows are never materialised; otherwise it is decoded with
+    decode_json and filtered afterwards.
+    """
+    response = requests.get(url, timeout=timeout, stream=ijson is not None)
+    response.raise_for_status()
+    if ijson is not None:
+        response.raw.decode_content = True
+        items = ijson.items(response.raw, 'item')
+    else:
+        items = decode_json(response.content)
+
+    data = {column: [] for column in columns}
+    for item in items:
+        if exch_seg and item.get('exch_seg') != exch_seg:
+            continue
+        for column in columns:
+            data[column].append(item.get(column))
+
+    token_df = pd.DataFrame(data, columns=columns)
+    if 'expiry' in token_df:
+        token_df['expiry'] = token_df['expiry'].str.strip()
+    if 'strike' in token_df:
+        token_df = token_df.astype({'strike': float})
+    return token_df
@@ -0,0 +1,220 @@
+import io
+import json
+import sys
+import time
+import types
+import zlib
+from collections import deque
+from datetime import datetime, timedelta
+import numpy as np
+import requests
+from decoding import SCRIP_MASTER_URL
+
+# NSE cash session, 5 minute bars
+SESSION_START = (9, 15)
+BARS_PER_SESSION = 75
+INTERVAL_MINUTES = {
+    "ONE_MINUTE": 1,
+    "THREE_MINUTE": 3,
+    "FIVE_MINUTE": 5,
+    "TEN_MINUTE": 10,
+    "FIFTEEN_MINUTE": 15,
+    "THIRTY_MINUTE": 30,
+    "ONE_HOUR": 60,
+}
+
+
+# Synthetic OHLCV
+def session_timestamps(to_date, days=10, interval='FIVE_MINUTE'):
+    """Bar open times for every weekday session in the ``days`` before ``to_date``."""
+    step = INTERVAL_MINUTES[interval]
+    bars = BARS_PER_SESSION * 5 // step
+    stamps = []
+    day = (to_date - timedelta(days=days)).replace(hour=0, minute=0, second=0, microsecond=0)
+    while day <= to_date:
+        if day.weekday() < 5:
+            open_time = day.replace(hour=SESSION_START[0], minute=SESSION_START[1])
+            for i in range(bars):
+                stamp = open_time + timedelta(minutes=i * step)
+                if stamp > to_date:
+                    break
+                stamps.append(stamp)
+        day += timedelta(days=1)
+    return stamps
+
+
+def synthetic_candles(seed, stamps, start_price=None):
+    """Generate Angel-style candle rows for the given bar times.
+
+    Prices follow a geometric random walk whose drift switches regime every
+    few dozen bars, so trend-following rules actually fire; volume follows
+    the usual intraday U shape.
+    """
+    rng = np.random.default_rng(seed)
+    n = len(stamps)
+    if n == 0:
+        return []
+    price = start_price or float(rng.uniform(50, 5000))
+
+    regime_len = rng.integers(20, 80)
+    drift = np.repeat(rng.normal(0, 0.0006, n // regime_len + 1), regime_len)[:n]
+    returns = drift + rng.normal(0, 0.0015, n)
+    close = price * np.exp(np.cumsum(returns))
+    open_ = np.concatenate(([price], close[:-1])) * np.exp(rng.normal(0, 0.0003, n))
+    spread = np.abs(rng.normal(0, 0.0012, (2, n)))
+    high = np.maximum(open_, close) * (1 + spread[0])
+    low = np.minimum(open_, close) * (1 - spread[1])
+
+    minute_of_day = np.array([s.hour * 60 + s.minute for s in stamps])
+    session_pos = (minute_of_day - (SESSION_START[0] * 60 + SESSION_START[1])) / 375.0
+    shape = 1.0 + 2.5 * (session_pos - 0.5) ** 2
+    volume = (rng.lognormal(10, 0.6, n) * shape).astype(np.int64)
+
+    return [
+        [s.strftime("%Y-%m-%dT%H:%M:%S+05:30"), round(o, 2), round(h, 2), round(l, 2), round(c, 2), int(v)]
+        for s, o, h, l, c, v in zip(stamps, open_, high, low, close, volume)
+    ]
+
+
+def scrip_master(symbols, first_token=10000):
+    """Rows shaped like OpenAPIScripMaster.json for an NSE equity universe."""
+    return [
+        {
+            "token": str(first_token + i),
+            "symbol": f"{name}-EQ",
+            "name": name,
+            "expiry": "",
+            "strike": "-1.000000",
+            "lotsize": "1",
+            "instrumenttype": "",
+            "exch_seg": "NSE",
+            "tick_size": "5.000000",
+        }
+        for i, name in enumerate(symbols)
+    ]
+
+
+def synthetic_universe(count):
+    return [f"SYN{i:05d}" for i in range(count)]
+
+
+# Fake SmartConnect
+class FakeSmartConnect:
+    """Drop-in stand-in for ``SmartApi.SmartConnect`` used by benchmarks.
+
+    ``LATENCY`` (seconds) is added to every getCandleData call and
+    ``RATE_LIMIT`` (requests per second) reproduces the broker's
+    "exceeding access rate" rejection.
+    """
+
+    LATENCY = 0.0
+    RATE_LIMIT = None
+
+    def __init__(self, api_key=None, latency=None, rate_limit=None):
+        self.api_key = api_key
+        self.latency = self.LATENCY if latency is None else latency
+        self.rate_limit = self.RATE_LIMIT if rate_limit is None else rate_limit
+        self.calls = 0
+        self.rejected = 0
+        self._recent = deque()
+        self._cache = {}
+
+    def generateSession(self, clientCode, password, totp=None):
+        return {
+            "status": True,
+            "message": "SUCCESS",
+            "errorcode": "",
+            "data": {"jwtToken": "fake-jwt", "refreshToken": "fake-refresh", "feedToken": "fake-feed"},
+        }
+
+    def _throttled(self):
+        if not self.rate_limit:
+            return False
+        now = time.monotonic()
+        while self._recent and now - self._recent[0] >= 1.0:
+            self._recent.popleft()
+        if len(self._recent) >= self.rate_limit:
+            return True
+        self._recent.append(now)
+        return False
+
+    def getCandleData(self, historicDataParams):
+        self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+        if self._throttled():
+            self.rejected += 1
+            return {
+                "status": False,
+                "message": "Access denied because of exceeding access rate",
+                "errorcode": "AB1004",
+                "data": None,
+            }
+
+        params = historicDataParams
+        key = (params["symboltoken"], params["interval"], params["fromdate"], params["todate"])
+        if key not in self._cache:
+            from_date = datetime.strptime(params["fromdate"], "%Y-%m-%d %H:%M")
+            to_date = datetime.strptime(params["todate"], "%Y-%m-%d %H:%M")
+            stamps = session_timestamps(to_date, (to_date - from_date).days, params["interval"])
+            seed = zlib.crc32(str(params["symboltoken"]).encode())
+            self._cache[key] = synthetic_candles(seed, stamps)
+        return {"status": True, "message": "SUCCESS", "errorcode": "", "data": self._cache[key]}
+
+
+# Installation
+class FakeResponse:
+    def __init__(self, payload=None, status_code=200):
+        self._payload = payload
+        self.status_code = status_code
+        self.text = ""
+        self.content = json.dumps(payload).encode()
+        self.raw = io.BytesIO(self.content)
+
+    def json(self):
+        return self._payload
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.HTTPError(f"{self.status_code} Error")
+
+
+def install_broker(smart_connect, payloads, on_post=None, passthrough=True):
+    """Route the scanners' broker and HTTP calls to fakes.
+
+    Registers a ``SmartApi`` module whose SmartConnect is ``smart_connect``
+    and serves ``payloads`` (URL -> JSON payload) from ``requests.get``;
+    other URLs go to the real ``requests.get`` when ``passthrough``, else
+    answer 404. POSTs are passed to ``on_post(url, payload)`` and answered
+    with success. Must run before the scanner modules are imported.
+    """
+    module = types.ModuleType("SmartApi")
+    module.SmartConnect = smart_connect
+    sys.modules["SmartApi"] = module
+
+    real_get = requests.get
+
+    def fake_get(url, *args, **kwargs):
+        if url in payloads:
+            return FakeResponse(payloads[url])
+        if passthrough:
+            return real_get(url, *args, **kwargs)
+        return FakeResponse({}, status_code=404)
+
+    def fake_post(url, *args, **kwargs):
+        if on_post is not None:
+            on_post(url, kwargs.get("json"))
+        return FakeResponse({"status": True})
+
+    requests.get = fake_get
+    requests.post = fake_post
+
+
+def install(symbols):
+    """Install FakeSmartConnect with a scrip master for ``symbols``.
+
+    Signal webhook POSTs are swallowed.
+    """
+    master = scrip_master(symbols)
+    install_broker(FakeSmartConnect, {SCRIP_MASTER_URL: master})
+    return master
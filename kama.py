@@ -4,10 +4,11 @@ from datetime import datetime, timedelta
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 import pandas as pd
-import requests
 import numpy as np
 import pandas_ta as ta
 import time
+from candles import CandleBuffer
+from decoding import load_scrip_master
 
 # Initialize FastAPI app
 app = FastAPI()
@@ -56,15 +57,10 @@ save_data = True
 
 # Token Map Fetching
 def fetch_token_map():
-    url = 'https://margincalculator.angelbroking.com/OpenAPI_File/files/OpenAPIScripMaster.json'
     try:
-        response = requests.get(url)
-        if response.status_code == 200:
-            token_df = pd.DataFrame(response.json())
-            token_df['expiry'] = token_df['expiry'].str.strip()
-            token_df = token_df.astype({'strike': float})
-            logging.info("Token map fetched successfully.")
-            return token_df
+        token_df = load_scrip_master(timeout=None)
+        logging.info("Token map fetched successfully.")
+        return token_df
     except Exception as e:
         logging.error(f"Error fetching token map: {e}")
     return pd.DataFrame()
@@ -74,6 +70,9 @@ token_df = fetch_token_map()
 # Symbol List
 SYMBOL_LIST = ["ACC", "APOLLOTYRE", "ASHOKLEY", "ASIANPAINT", "BAJAJHLDNG", "HDFCBANK", "TCS", "RELIANCE"]
 
+# Columnar candle storage reused across symbols
+candle_buffer = CandleBuffer()
+
 # Fetch Historical Data
 def get_historical_data(symbol_token, interval='FIVE_MINUTE', days=10):
     time.sleep(1)
@@ -89,70 +88,83 @@ def get_historical_data(symbol_token, interval='FIVE_MINUTE', days=10):
     return smart_api.getCandleData(params)['data']
 
 # Custom KAMA Calculation (Matches Pine Script Logic)
-def calculate_kama(df, length=14, fast_length=2, slow_length=30):
+def calculate_kama(candles, length=14, fast_length=2, slow_length=30, out=None):
     """
     Calculate Kaufman Adaptive Moving Average (KAMA).
     Args:
-        df: DataFrame containing the 'close' column.
+        candles: Candles (or DataFrame) containing the 'close' column.
         length: Period for ER calculation.
         fast_length: Fast EMA length.
         slow_length: Slow EMA length.
+        out: Optional array to write the result into.
     Returns:
-        A pandas Series containing KAMA values.
+        A NumPy array containing KAMA values.
     """
-    close = df['close']
-    kama = [close.iloc[0]]  # Initialize KAMA with the first close price
+    close = np.asarray(candles['close'], dtype=np.float64)
+    n = len(close)
+    kama = out if out is not None else np.empty(n)
+    if n == 0:
+        return kama
 
     # Calculate momentum and volatility
-    momentum = close.diff(length).abs()
-    volatility = close.diff().abs().rolling(window=length).sum()
+    momentum = np.full(n, np.nan)
+    volatility = np.full(n, np.nan)
+    if n > length:
+        momentum[length:] = np.abs(close[length:] - close[:-length])
+        volatility[length:] = np.convolve(np.abs(np.diff(close)), np.ones(length), 'valid')
 
     # Efficiency Ratio (ER)
-    er = np.where(volatility != 0, momentum / volatility, 0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        er = np.where(volatility != 0, momentum / volatility, 0)
 
     # Smoothing constant (alpha)
     fast_alpha = 2 / (fast_length + 1)
     slow_alpha = 2 / (slow_length + 1)
     alpha = (er * (fast_alpha - slow_alpha) + slow_alpha) ** 2
+    alpha = np.where(np.isnan(alpha), slow_alpha, alpha).tolist()
 
     # Iteratively calculate KAMA
-    for i in range(1, len(close)):
-        current_alpha = alpha[i] if not np.isnan(alpha[i]) else slow_alpha
-        new_kama = current_alpha * close.iloc[i] + (1 - current_alpha) * kama[-1]
-        kama.append(new_kama)
+    values = close.tolist()
+    current = values[0]  # Initialize KAMA with the first close price
+    kama[0] = current
+    for i in range(1, n):
+        current = alpha[i] * values[i] + (1 - alpha[i]) * current
+        kama[i] = current
 
-    return pd.Series(kama, index=close.index)
+    return kama
 
 
 
 
 
 # Calculate Indicators
-def calculate_indicators(df, short_length=14, long_length=250):
+def calculate_indicators(candles, short_length=14, long_length=250):
     """
     Calculate KAMA Short, KAMA Long, ADX, ATR, and Choppiness Index.
     """
+    high, low, close = candles.series('high'), candles.series('low'), candles.series('close')
+
     # Calculate KAMA Short and KAMA Long
-    df['KAMA_short'] = calculate_kama(df, length=short_length)
-    df['KAMA_long'] = calculate_kama(df, length=long_length)
+    calculate_kama(candles, length=short_length, out=candles.column('KAMA_short'))
+    calculate_kama(candles, length=long_length, out=candles.column('KAMA_long'))
 
     # ADX Calculation
-    adx = ta.adx(high=df['high'], low=df['low'], close=df['close'], length=14)
-    df['ADX'] = adx['ADX_14']
-    df['+DI'] = adx['DMP_14']
-    df['-DI'] = adx['DMN_14']
+    adx = ta.adx(high=high, low=low, close=close, length=14)
+    candles['ADX'] = adx['ADX_14']
+    candles['+DI'] = adx['DMP_14']
+    candles['-DI'] = adx['DMN_14']
 
     # ATR Calculation
-    df['ATR'] = ta.atr(high=df['high'], low=df['low'], close=df['close'], length=14)
+    candles['ATR'] = ta.atr(high=high, low=low, close=close, length=14)
 
     # Choppiness Index
-    df['Choppiness_Index'] = ta.chop(high=df['high'], low=df['low'], close=df['close'], length=14)
+    candles['Choppiness_Index'] = ta.chop(high=high, low=low, close=close, length=14)
 
-    # KAMA Color Signals
-    df['KAMA_short_signal'] = df['KAMA_short'].diff().apply(lambda x: 'green' if x > 0 else 'red')
-    df['KAMA_long_signal'] = df['KAMA_long'].diff().apply(lambda x: 'green' if x > 0 else 'red')
+    # KAMA Color Signals (True = green, False = red)
+    candles['KAMA_short_signal'] = np.diff(candles['KAMA_short'], prepend=np.nan) > 0
+    candles['KAMA_long_signal'] = np.diff(candles['KAMA_long'], prepend=np.nan) > 0
 
-    return df
+    return candles
 
 
 
@@ -162,49 +174,53 @@ def generate_signals(symbol):
     token = token_info['token']
     candle_data = get_historical_data(token)
 
-    df = pd.DataFrame(candle_data, columns=['timestamp', 'open', 'high', 'low', 'close', 'volume'])
-    df['timestamp'] = pd.to_datetime(df['timestamp'])
-    df.set_index('timestamp', inplace=True)
-
-    df = calculate_indicators(df)
-    latest = df.iloc[-1]
-    prev = df.iloc[-2]
+    candles = calculate_indicators(candle_buffer.load(candle_data))
+    latest, prev = -1, -2
+    short_green = candles['KAMA_short_signal']
+    long_green = candles['KAMA_long_signal']
+    close = candles.close[latest]
+    adx = candles['ADX'][latest]
+    chop = candles['Choppiness_Index'][latest]
+    atr = candles['ATR'][latest]
 
     signal = "NONE"
     stop_loss = None
     target = None
 
-    if (latest['KAMA_short_signal'] == 'green' and prev['KAMA_short_signal'] == 'red'
-        and latest['KAMA_long_signal'] == 'green'
-        and latest['Choppiness_Index'] < 38.2
-        and latest['ADX'] > 55):
+    if (short_green[latest] and not short_green[prev]
+        and long_green[latest]
+        and chop < 38.2
+        and adx > 55):
         signal = "BUY"
-        stop_loss = latest['low'] * 0.999
-        target = latest['close'] + (2.5 * latest['ATR'])
+        stop_loss = candles.low[latest] * 0.999
+        target = close + (2.5 * atr)
 
-    elif (latest['KAMA_short_signal'] == 'red' and prev['KAMA_short_signal'] == 'green'
-          and latest['KAMA_long_signal'] == 'red'
-          and latest['Choppiness_Index'] < 38.2
-          and latest['ADX'] > 55):
+    elif (not short_green[latest] and short_green[prev]
+          and not long_green[latest]
+          and chop < 38.2
+          and adx > 55):
         signal = "SELL"
-        stop_loss = latest['high'] * 1.001
-        target = latest['close'] - (2.5 * latest['ATR'])
+        stop_loss = candles.high[latest] * 1.001
+        target = close - (2.5 * atr)
 
     # Save DataFrame to CSV
     if save_data:
         output_file = f"{symbol}.csv"
+        df = candles.to_frame()
+        for column in ('KAMA_short_signal', 'KAMA_long_signal'):
+            df[column] = np.where(df[column], 'green', 'red')
         df.to_csv(output_file, index=True)
         logging.info(f"Data for {symbol} saved to {output_file}")
 
     return {
         "symbol": symbol,
         "signal": signal,
-        "Close": latest['close'],
-        "KAMA_short": latest['KAMA_short'],
-        "KAMA_long": latest['KAMA_long'],
-        "ADX": latest['ADX'],
-        "Choppiness_Index": latest['Choppiness_Index'],
-        "ATR": latest['ATR'],
+        "Close": close,
+        "KAMA_short": candles['KAMA_short'][latest],
+        "KAMA_long": candles['KAMA_long'][latest],
+        "ADX": adx,
+        "Choppiness_Index": chop,
+        "ATR": atr,
         "Stop_Loss": round(stop_loss, 2) if stop_loss else None,
         "Target": round(target, 2) if target else None
     }
@@ -4,11 +4,11 @@ from datetime import datetime, timedelta
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 import pandas as pd
-import requests
-from ta.trend import SMAIndicator
-from ta.momentum import RSIIndicator
+import numpy as np
 import pyotp
 import time
+from candles import CandleBuffer
+from decoding import load_scrip_master
 
 # Initialize FastAPI app
 app = FastAPI()
@@ -61,18 +61,10 @@ except Exception as e:
 
 # Fetch token map
 def fetch_token_map():
-    url = 'https://margincalculator.angelbroking.com/OpenAPI_File/files/OpenAPIScripMaster.json'
     try:
-        response = requests.get(url)
-        if response.status_code == 200:
-            token_df = pd.DataFrame(response.json())
-            token_df['expiry'] = token_df['expiry'].str.strip()
-            token_df = token_df.astype({'strike': float})
-            logging.info("Token map fetched successfully.")
-            return token_df
-        else:
-            logging.error("Failed to fetch token map.")
-            return pd.DataFrame()
+        token_df = load_scrip_master(timeout=None)
+        logging.info("Token map fetched successfully.")
+        return token_df
     except Exception as e:
         logging.error(f"Error fetching token map: {e}")
         return pd.DataFrame()
@@ -125,6 +117,10 @@ SYMBOL_LIST =  [
 ]
 
 
+# Columnar candle storage reused across symbols
+candle_buffer = CandleBuffer()
+
+
 def get_token_info(symbol, exch_seg='NSE'):
     df = token_df
     eq_df = df[(df['exch_seg'] == exch_seg) & (df['symbol'].str.contains('EQ'))]
@@ -152,36 +148,42 @@ def get_historical_data(symbol_token, interval='FIVE_MINUTE', days=2):
         logging.error(f"Error fetching historical data: {e}")
     return None
 
+def calculate_sma(values, window, out=None):
+    """Simple moving average; NaN until ``window`` values are available."""
+    out = out if out is not None else np.empty(len(values))
+    out[:] = np.nan
+    if len(values) >= window:
+        out[window - 1:] = np.convolve(values, np.ones(window) / window, 'valid')
+    return out
+
+
 def calculate_indicators(candle_data, symbol_name):
     """
     Calculate indicators and log OHLC and indicator values with the symbol name.
     """
-    df = pd.DataFrame(candle_data, columns=['timestamp', 'open', 'high', 'low', 'close', 'volume'])
-    df['timestamp'] = pd.to_datetime(df['timestamp'])
-    df.set_index('timestamp', inplace=True)
+    candles = candle_buffer.load(candle_data)
 
     # Calculate SMA
-    df['SMA_20'] = SMAIndicator(close=df['close'], window=20).sma_indicator()
-    df['SMA_200'] = SMAIndicator(close=df['close'], window=200).sma_indicator()
+    calculate_sma(candles.close, 20, out=candles.column('SMA_20'))
+    calculate_sma(candles.close, 200, out=candles.column('SMA_200'))
 
     # Log OHLC and indicators for the latest row
-    latest = df.iloc[-1]
     logging.info(
-        f"Symbol: {symbol_name} | OHLC: Open={latest['open']}, High={latest['high']}, Low={latest['low']}, "
-        f"Close={latest['close']}, Volume={latest['volume']} | Indicators: SMA_20={latest['SMA_20']}, "
-        f"SMA_200={latest['SMA_200']}"
+        f"Symbol: {symbol_name} | OHLC: Open={candles.open[-1]}, High={candles.high[-1]}, Low={candles.low[-1]}, "
+        f"Close={candles.close[-1]}, Volume={candles.volume[-1]} | Indicators: SMA_20={candles['SMA_20'][-1]}, "
+        f"SMA_200={candles['SMA_200'][-1]}"
     )
 
-    return df
+    return candles
 
 
-def generate_signal(df, symbol_name):
+def generate_signal(candles, symbol_name):
     """
     Generate buy or sell signals based on updated criteria and log the signal details.
     """
-    latest_close = df['close'].iloc[-1]
-    sma_20 = df['SMA_20'].iloc[-1]
-    sma_200 = df['SMA_200'].iloc[-1]
+    latest_close = candles.close[-1]
+    sma_20 = candles['SMA_20'][-1]
+    sma_200 = candles['SMA_200'][-1]
 
     # Calculate differences as percentages
     diff_close_sma20 = abs((latest_close - sma_20) / sma_20) * 100
@@ -239,10 +241,10 @@ async def scan_stocks():
                 candle_data = get_historical_data(token)
                 if candle_data:
                     # Pass symbol_name to calculate_indicators and generate_signal
-                    df = calculate_indicators(candle_data, symbol_name)
-                    signal = generate_signal(df, symbol_name)
+                    candles = calculate_indicators(candle_data, symbol_name)
+                    signal = generate_signal(candles, symbol_name)
                     if signal:
-                        current_price = df['close'].iloc[-1]
+                        current_price = candles.close[-1]
                         signals.append({
                             "symbol": symbol_name,
                             "token": token,
@@ -0,0 +1,304 @@
+import argparse
+import asyncio
+import atexit
+import bisect
+import gzip
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime
+
+import fakebroker
+from alerts import SignalDeduplicator
+from decoding import SCRIP_MASTER_URL, decode_json
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Set while replaying so a configured RECORD_FILE does not record the replay
+REPLAY_ENV = "SCANNER_REPLAY"
+
+
+class ReplayFinished(Exception):
+    pass
+
+
+def _default(value):
+    if hasattr(value, "item"):
+        return value.item()
+    raise TypeError(f"Cannot serialise {type(value).__name__}")
+
+
+def _encode(record):
+    if orjson is not None:
+        return orjson.dumps(record, default=_default, option=orjson.OPT_SERIALIZE_NUMPY)
+    return json.dumps(record, default=_default, separators=(',', ':')).encode()
+
+
+# Recording
+class SessionRecorder:
+    """Append broker traffic to a gzip JSON-lines log.
+
+    Each line is ``[kind, time, key, data]``: ``candles`` (key = token, data =
+    the getCandleData response) or ``scrip_master`` (data = token map columns).
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._file = gzip.open(path, "ab")
+        self._lock = threading.Lock()
+
+    def record(self, kind, key, data, at=None):
+        line = _encode([kind, time.time() if at is None else at, key, data]) + b"\n"
+        with self._lock:
+            self._file.write(line)
+            self._file.flush()
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+
+class RecordingSmartConnect:
+    """Wrap a SmartConnect so every getCandleData response is recorded."""
+
+    def __init__(self, smart_api, recorder):
+        self._smart_api = smart_api
+        self._recorder = recorder
+
+    def getCandleData(self, historicDataParams):
+        requested_at = time.time()
+        response = self._smart_api.getCandleData(historicDataParams)
+        self._recorder.record("candles", historicDataParams["symboltoken"], response, at=requested_at)
+        return response
+
+    def __getattr__(self, name):
+        return getattr(self._smart_api, name)
+
+
+def open_recorder(path):
+    """SessionRecorder for ``path``, or None when not recording or replaying."""
+    if not path or os.environ.get(REPLAY_ENV):
+        return None
+    recorder = SessionRecorder(path)
+    atexit.register(recorder.close)
+    logging.info(f"Recording broker responses to {path}")
+    return recorder
+
+
+# Replay
+class SessionLog:
+    """Recorded session loaded into memory, indexed by token and time."""
+
+    def __init__(self, path):
+        self.candles = defaultdict(lambda: ([], []))
+        self.scrip_master = []
+        self.start = None
+        self.end = None
+        for kind, at, key, data in self._read(path):
+            self.start = at if self.start is None else min(self.start, at)
+            self.end = at if self.end is None else max(self.end, at)
+            if kind == "candles":
+                times, responses = self.candles[str(key)]
+                times.append(at)
+                responses.append(data)
+            elif kind == "scrip_master":
+                columns = list(data)
+                self.scrip_master = [dict(zip(columns, row)) for row in zip(*data.values())]
+        for times, responses in self.candles.values():
+            order = sorted(range(len(times)), key=times.__getitem__)
+            times[:] = [times[i] for i in order]
+            responses[:] = [responses[i] for i in order]
+
+    @staticmethod
+    def _read(path):
+        # A log from a killed process lacks the gzip trailer; keep what was flushed
+        with gzip.open(path, "rb") as f:
+            try:
+                for line in f:
+                    if line.endswith(b"\n"):
+                        yield decode_json(line)
+            except EOFError:
+                logging.warning(f"{path} was not closed cleanly; replaying what was recorded")
+
+    def candle_response(self, token, at):
+        """Latest response for ``token`` recorded at or before time ``at``.
+
+        Only before the first recording is the earliest response used, so a
+        replay never sees candles from the future.
+        """
+        times, responses = self.candles.get(str(token), ([], []))
+        if not times:
+            return None
+        return responses[max(bisect.bisect_right(times, at) - 1, 0)]
+
+
+class ReplayClock:
+    """Virtual wall clock; sleeping advances it, optionally scaled in real time."""
+
+    def __init__(self, start, speed=0.0):
+        self.now = start
+        self.speed = speed
+
+    def advance(self, seconds):
+        self.now += seconds
+        return seconds / self.speed if self.speed else 0
+
+
+class ClockTime:
+    """Stand-in for a scanner module's ``time``."""
+
+    def __init__(self, clock):
+        self._clock = clock
+
+    def sleep(self, seconds):
+        time.sleep(self._clock.advance(seconds))
+
+    def time(self):
+        return self._clock.now
+
+    def __getattr__(self, name):
+        return getattr(time, name)
+
+
+class ClockAsyncio:
+    """Stand-in for a scanner module's ``asyncio``; ends the replay at the end of the log."""
+
+    def __init__(self, clock, end, stop_at_end=True):
+        self._clock = clock
+        self._end = end
+        self._stop_at_end = stop_at_end
+
+    async def sleep(self, seconds):
+        await asyncio.sleep(self._clock.advance(seconds))
+        if self._clock.now > self._end:
+            if self._stop_at_end:
+                raise ReplayFinished()
+            await asyncio.Event().wait()
+
+    def __getattr__(self, name):
+        return getattr(asyncio, name)
+
+
+def clock_datetime(clock):
+    """``datetime`` subclass whose now() reads the virtual clock."""
+
+    class ClockDatetime(datetime):
+        @classmethod
+        def now(cls, tz=None):
+            return datetime.fromtimestamp(clock.now, tz)
+
+    return ClockDatetime
+
+
+class ReplaySmartConnect:
+    """SmartConnect stand-in answering from a SessionLog at the virtual time."""
+
+    def __init__(self, log, clock):
+        self.log = log
+        self.clock = clock
+        self.calls = 0
+
+    def generateSession(self, clientCode, password, totp=None):
+        return {"status": True, "message": "SUCCESS", "errorcode": "",
+                "data": {"jwtToken": "replay", "refreshToken": "replay", "feedToken": "replay"}}
+
+    def getCandleData(self, historicDataParams):
+        self.calls += 1
+        response = self.log.candle_response(historicDataParams["symboltoken"], self.clock.now)
+        if response is None:
+            return {"status": False, "message": "No recorded response", "errorcode": "", "data": None}
+        return response
+
+
+def load_scanner(log, clock, scanner_module="Ai_APi", stop_at_end=True):
+    """Import the scanner with broker, HTTP and clocks driven by the log.
+
+    Returns the module and the list that collects published signals.
+    """
+    os.environ[REPLAY_ENV] = "1"
+    published = []
+    fakebroker.install_broker(
+        lambda api_key=None, **kwargs: ReplaySmartConnect(log, clock),
+        {SCRIP_MASTER_URL: log.scrip_master},
+        on_post=lambda url, payload: published.append(payload),
+        passthrough=False,
+    )
+
+    scanner = __import__(scanner_module)
+    scanner.time = ClockTime(clock)
+    scanner.datetime = clock_datetime(clock)
+    scanner.asyncio = ClockAsyncio(clock, log.end, stop_at_end)
+    if hasattr(scanner, "signal_filter"):
+        # Start from empty in-memory dedup state; the live state file is left alone
+        scanner.signal_filter = SignalDeduplicator(cooldown=scanner.SIGNAL_COOLDOWN)
+    return scanner, published
+
+
+async def run_headless(scanner):
+    """Run the scanner's scheduler until the log is exhausted; collect each scan."""
+    scans = []
+    scan_symbols = scanner.scan_symbols
+
+    def recording_scan(symbols):
+        results = scan_symbols(symbols)
+        scans.append({"time": scanner.time.time(), "results": results})
+        return results
+
+    scanner.scan_symbols = recording_scan
+    try:
+        await scanner.scheduled_scanner()
+    except ReplayFinished:
+        pass
+    finally:
+        scanner.scan_symbols = scan_symbols
+    return scans
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Replay a recorded market session through the scanner")
+    parser.add_argument("log", help="session log written with RECORD_FILE")
+    parser.add_argument("--speed", type=float, default=0.0,
+                        help="virtual seconds per real second (0 = as fast as possible)")
+    parser.add_argument("--scanner", default="Ai_APi")
+    parser.add_argument("--serve", action="store_true", help="also serve /signals while replaying")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--output", help="write scans and published signals as JSON")
+    parser.add_argument("--profile", action="store_true", help="print a cProfile summary")
+    args = parser.parse_args()
+
+    session = SessionLog(args.log)
+    if session.start is None:
+        sys.exit(f"{args.log} is empty")
+    clock = ReplayClock(session.start, args.speed)
+    scanner, published = load_scanner(session, clock, args.scanner, stop_at_end=not args.serve)
+
+    if args.serve:
+        import uvicorn
+        uvicorn.run(scanner.app, host="0.0.0.0", port=args.port)
+        sys.exit(0)
+
+    profiler = None
+    if args.profile:
+        import cProfile
+        profiler = cProfile.Profile()
+        profiler.enable()
+    started = time.perf_counter()
+    scans = asyncio.run(run_headless(scanner))
+    elapsed = time.perf_counter() - started
+    if profiler:
+        import pstats
+        profiler.disable()
+        pstats.Stats(profiler).sort_stats("cumulative").print_stats(25)
+
+    print(f"replayed {session.end - session.start:.0f}s of session in {elapsed:.2f}s: "
+          f"{len(scans)} scans, {scanner.smart_api.calls} candle requests, {len(published)} signals published")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"scans": scans, "published": published}, f, indent=2, default=_default)
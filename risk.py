@@ -0,0 +1,148 @@
+import logging
+import numpy as np
+
+SIDES = {"BUY": 1, "SELL": -1}
+
+
+class RiskManager:
+    """Post-signal stage: risk levels, position size, exposure checks, ranking.
+
+    ``plan`` works on the whole batch of signals from a scan at once:
+    stops and targets come from ATR multiples, the size risks
+    ``risk_per_trade`` of capital per position, and correlation exposure
+    against the open positions is checked with matrix products instead of
+    per-symbol loops. Sector budgets are then filled best signal first.
+    """
+
+    def __init__(self, capital, risk_per_trade=0.01, stop_atr=1.5, target_atr=2.5,
+                 max_position_pct=0.2, max_sector_pct=0.3, max_correlated_pct=0.25,
+                 lookback=100, sectors=None):
+        self.capital = capital
+        self.risk_per_trade = risk_per_trade
+        self.stop_atr = stop_atr
+        self.target_atr = target_atr
+        self.max_position_pct = max_position_pct
+        self.max_sector_pct = max_sector_pct
+        self.max_correlated_pct = max_correlated_pct
+        self.lookback = lookback
+        self.sectors = sectors or {}
+        self._returns = {}
+
+    def record(self, symbol, close):
+        """Keep the last ``lookback`` log returns of a scanned symbol."""
+        close = np.asarray(close[-(self.lookback + 1):], dtype=np.float64)
+        if len(close) > 1:
+            self._returns[symbol] = np.diff(np.log(close))
+
+    def _return_matrix(self, symbols):
+        """Aligned (lookback x len(symbols)) returns; zeros where history is missing."""
+        matrix = np.zeros((self.lookback, len(symbols)))
+        for j, symbol in enumerate(symbols):
+            returns = self._returns.get(symbol)
+            if returns is not None and len(returns):
+                matrix[-len(returns):, j] = returns
+        return matrix
+
+    @staticmethod
+    def _standardize(matrix):
+        centered = matrix - matrix.mean(axis=0)
+        std = centered.std(axis=0)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return np.where(std > 0, centered / std, 0.0)
+
+    def plan(self, results, open_positions=()):
+        """Fill Stop_Loss, Target, Quantity, Risk_Status and Rank; best first.
+
+        ``results`` need 'symbol', 'signal', 'Close', 'ATR', 'Prev_Low' and
+        'Prev_High'. ``open_positions`` are dicts with 'symbol', 'signal'
+        (side), 'quantity' and 'price'.
+        """
+        if not results:
+            return []
+
+        side = np.array([SIDES[r['signal']] for r in results], dtype=np.float64)
+        close = np.array([r['Close'] for r in results], dtype=np.float64)
+        atr = np.array([r['ATR'] for r in results], dtype=np.float64)
+        prev_low = np.array([r['Prev_Low'] for r in results], dtype=np.float64)
+        prev_high = np.array([r['Prev_High'] for r in results], dtype=np.float64)
+
+        # Risk levels
+        stop = np.where(side > 0, prev_low - self.stop_atr * atr, prev_high + self.stop_atr * atr)
+        target = close + side * self.target_atr * atr
+        risk_per_share = np.abs(close - stop)
+
+        # Position size: fixed fractional risk, capped by position value
+        with np.errstate(divide='ignore', invalid='ignore'):
+            quantity = np.floor(self.capital * self.risk_per_trade / risk_per_share)
+            quantity = np.minimum(quantity, np.floor(self.capital * self.max_position_pct / close))
+            reward_risk = np.abs(target - close) / risk_per_share
+        valid = np.isfinite(quantity) & (quantity > 0) & np.isfinite(reward_risk)
+        quantity = np.where(valid, quantity, 0)
+        value = quantity * close
+
+        # Open book as signed values
+        open_symbols = [p['symbol'] for p in open_positions]
+        open_value = np.array([SIDES[p['signal']] * p['quantity'] * p['price'] for p in open_positions],
+                              dtype=np.float64)
+
+        # Correlated exposure: corr(signal, open) @ signed open value, seen from the signal's side
+        if open_symbols:
+            missing = [s for s in open_symbols if s not in self._returns]
+            if missing:
+                logging.warning(f"No return history for open positions {', '.join(missing)}; "
+                                f"their correlation with new signals counts as zero.")
+            n = self.lookback
+            z_signal = self._standardize(self._return_matrix([r['symbol'] for r in results]))
+            z_open = self._standardize(self._return_matrix(open_symbols))
+            correlation = z_signal.T @ z_open / n
+            correlated = side * (correlation @ open_value)
+        else:
+            correlated = np.zeros(len(results))
+        correlated_ok = correlated <= self.max_correlated_pct * self.capital
+
+        # Rank on reward/risk, penalised by correlated exposure
+        load = np.clip(correlated / (self.max_correlated_pct * self.capital), 0, 1)
+        score = np.where(valid, reward_risk * (1 - 0.5 * load), -np.inf)
+        order = np.argsort(-score, kind='stable')
+
+        # Sector exposure: open book per sector, then signals accepted greedily in rank order
+        sector_names = sorted({self.sectors.get(r['symbol'], 'UNKNOWN') for r in results}
+                              | {self.sectors.get(s, 'UNKNOWN') for s in open_symbols})
+        sector_index = {name: i for i, name in enumerate(sector_names)}
+        signal_sector = np.array([sector_index[self.sectors.get(r['symbol'], 'UNKNOWN')] for r in results])
+        open_sectors = np.zeros((len(open_symbols), len(sector_names)))
+        if open_symbols:
+            open_sectors[np.arange(len(open_symbols)),
+                         [sector_index[self.sectors.get(s, 'UNKNOWN')] for s in open_symbols]] = 1
+        exposure = np.abs(open_value) @ open_sectors
+        sector_limit = self.max_sector_pct * self.capital
+        sector_ok = np.ones(len(results), dtype=bool)
+        for i in order:
+            if not (valid[i] and correlated_ok[i]):
+                continue
+            # A rejected signal is not taken, so it uses none of the sector budget
+            after = exposure[signal_sector[i]] + value[i]
+            if after <= sector_limit:
+                exposure[signal_sector[i]] = after
+            else:
+                sector_ok[i] = False
+
+        status = np.select(
+            [~valid, ~correlated_ok, ~sector_ok],
+            ['NO_RISK', 'CORRELATION_LIMIT', 'SECTOR_LIMIT'],
+            'OK',
+        )
+        quantity = np.where(status == 'OK', quantity, 0)
+
+        planned = []
+        for rank, i in enumerate(order, start=1):
+            result = dict(results[i])
+            result.update({
+                "Stop_Loss": round(float(stop[i]), 2),
+                "Target": round(float(target[i]), 2),
+                "Quantity": int(quantity[i]),
+                "Risk_Status": str(status[i]),
+                "Rank": rank,
+            })
+            planned.append(result)
+        return planned